@@ -3,21 +3,39 @@ Analysis API endpoints
 Returns detailed analysis with human-readable and technical explanations
 """
 
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import ORJSONResponse
 from api.schemas import AnalysisResponse
 from services.data_ingestion import DataIngestionService
 from services.ml_pipeline import RiskScorer
 from services.data_fusion import DataFusionService
+from services.request_coalescer import coalesced_fetch
+from services.quality import assess_data_quality
 from datetime import datetime
 from typing import Dict
+import asyncio
 
 router = APIRouter()
 
+# (metric key, display label, default WHO threshold μg/m³, guideline wording, recommendations on exceedance)
+POLLUTANT_RULES = (
+    ("pm25", "PM2.5", 45.0, "limit", (
+        "Avoid outdoor activities, especially during peak hours",
+        "Use air purifiers indoors"
+    )),
+    ("no2", "NO₂", 200.0, "guideline", ()),
+    ("so2", "SO₂", 40.0, "limit", ()),
+)
+
 data_ingestion = DataIngestionService()
 risk_scorer = RiskScorer()
 data_fusion = DataFusionService()
 
-@router.get("/analysis/{lat}/{lng}", response_model=AnalysisResponse)
+@router.get(
+    "/analysis/{lat}/{lng}",
+    response_model=None,
+    responses={200: {"model": AnalysisResponse}}
+)
 async def get_detailed_analysis(
     lat: float,
     lng: float
@@ -30,27 +48,28 @@ async def get_detailed_analysis(
     """
     try:
         # Fetch data
-        raw_data = await data_ingestion.fetch_all_sources(lat, lng)
+        raw_data = await coalesced_fetch(data_ingestion.fetch_all_sources, lat, lng)
         fused_metrics = await data_fusion.fuse_data(raw_data, lat, lng)
-        risk_result = risk_scorer.calculate_risk_score(
+        risk_result = await asyncio.to_thread(
+            risk_scorer.calculate_risk_score,
             metrics=fused_metrics,
-            data_quality=_assess_data_quality(raw_data)
+            data_quality=assess_data_quality(raw_data)
         )
         
-        # Generate human-readable explanations
-        human_readable = _generate_human_readable(fused_metrics, risk_result)
-        
-        # Generate technical breakdown
-        technical = _generate_technical_breakdown(fused_metrics, raw_data, risk_result)
+        # Generate human-readable explanations and technical breakdown concurrently
+        human_readable, technical = await asyncio.gather(
+            asyncio.to_thread(_generate_human_readable, fused_metrics, risk_result),
+            asyncio.to_thread(_generate_technical_breakdown, fused_metrics, raw_data, risk_result)
+        )
         
-        return {
+        return ORJSONResponse(content={
             "human_readable": human_readable,
             "technical": technical,
             "model_info": {
                 "risk_model_version": risk_result.get("model_version", "1.0.0"),
                 "timestamp": datetime.utcnow().isoformat() + "Z"
             }
-        }
+        })
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error generating analysis: {str(e)}")
@@ -66,34 +85,18 @@ def _generate_human_readable(metrics: Dict, risk_result: Dict) -> Dict:
     # Air quality reasons
     air = metrics.get("air", {})
     
-    if "pm25" in air and air["pm25"].get("value"):
-        value = air["pm25"]["value"]
-        threshold = air["pm25"].get("threshold", 45.0)
-        if value > threshold:
-            exceedance = value / threshold
-            reasons.append(
-                f"PM2.5 levels ({value:.1f} μg/m³) exceed WHO limit ({threshold} μg/m³) by {exceedance:.1f}×"
-            )
-            recommendations.append("Avoid outdoor activities, especially during peak hours")
-            recommendations.append("Use air purifiers indoors")
-    
-    if "no2" in air and air["no2"].get("value"):
-        value = air["no2"]["value"]
-        threshold = air["no2"].get("threshold", 200.0)
-        if value > threshold:
-            exceedance = value / threshold
-            reasons.append(
-                f"NO₂ levels ({value:.1f} μg/m³) exceed WHO guideline ({threshold} μg/m³) by {exceedance:.1f}×"
-            )
-    
-    if "so2" in air and air["so2"].get("value"):
-        value = air["so2"]["value"]
-        threshold = air["so2"].get("threshold", 40.0)
+    for key, label, default_threshold, guideline, pollutant_recs in POLLUTANT_RULES:
+        data = air.get(key)
+        value = data and data.get("value")
+        if not value:
+            continue
+        threshold = data.get("threshold") or default_threshold
         if value > threshold:
             exceedance = value / threshold
             reasons.append(
-                f"SO₂ levels ({value:.1f} μg/m³) exceed WHO limit ({threshold} μg/m³) by {exceedance:.1f}×"
+                f"{label} levels ({value:.1f} μg/m³) exceed WHO {guideline} ({threshold} μg/m³) by {exceedance:.1f}×"
             )
+            recommendations.extend(pollutant_recs)
     
     # Water quality
     water = metrics.get("water", {})
@@ -117,7 +120,7 @@ def _generate_human_readable(metrics: Dict, risk_result: Dict) -> Dict:
     return {
         "summary": summary,
         "reasons": reasons,
-        "recommendations": list(set(recommendations)) if recommendations else ["Continue monitoring environmental conditions"]
+        "recommendations": list(dict.fromkeys(recommendations)) or ["Continue monitoring environmental conditions"]
     }
 
 def _generate_technical_breakdown(metrics: Dict, raw_data: Dict, risk_result: Dict) -> Dict:
@@ -127,9 +130,11 @@ def _generate_technical_breakdown(metrics: Dict, raw_data: Dict, risk_result: Di
     # Air quality technical data
     air_technical = {}
     air = metrics.get("air", {})
+    now_iso = datetime.utcnow().isoformat() + "Z"
     
     for pollutant, data in air.items():
         if isinstance(data, dict) and "value" in data:
+            source_kind = data.get("source_kind")
             technical_data = {
                 "raw_value": data["value"],
                 "unit": data.get("unit", "μg/m³"),
@@ -140,13 +145,13 @@ def _generate_technical_breakdown(metrics: Dict, raw_data: Dict, risk_result: Di
                 },
                 "exceedance_factor": data["value"] / data.get("threshold", 1) if data.get("threshold", 0) > 0 else None,
                 "data_source": data.get("source", "Unknown"),
-                "measurement_timestamp": datetime.utcnow().isoformat() + "Z",  # Would use actual timestamp
-                "spatial_coverage": "point" if "OpenAQ" in data.get("source", "") else "grid",
+                "measurement_timestamp": now_iso,  # Would use actual timestamp
+                "spatial_coverage": "point" if source_kind in ("ground", "fused") else "grid",
                 "uncertainty": None  # Would calculate from source data
             }
             
             # Add spatial resolution if satellite
-            if "Sentinel" in data.get("source", ""):
+            if source_kind in ("satellite", "fused"):
                 technical_data["spatial_resolution_km"] = 3.5 if pollutant == "no2" else 7.0
             
             air_technical[pollutant] = technical_data
@@ -170,24 +175,3 @@ def _generate_technical_breakdown(metrics: Dict, raw_data: Dict, risk_result: Di
     }
     
     return technical
-
-def _assess_data_quality(raw_data: dict) -> dict:
-    """Assess data quality (same as in location.py)"""
-    sources = raw_data.get("sources", {})
-    total_sources = len(sources)
-    valid_sources = sum(1 for s in sources.values() if "error" not in s)
-    coverage = valid_sources / total_sources if total_sources > 0 else 0.0
-    
-    timestamp_str = raw_data.get("timestamp", datetime.utcnow().isoformat() + "Z")
-    try:
-        data_time = datetime.fromisoformat(timestamp_str.replace("Z", "+00:00"))
-        age_hours = (datetime.utcnow() - data_time.replace(tzinfo=None)).total_seconds() / 3600
-    except:
-        age_hours = 0
-    
-    return {
-        "coverage": coverage,
-        "age_hours": age_hours,
-        "valid_sources": valid_sources,
-        "total_sources": total_sources
-    }
@@ -4,13 +4,18 @@ Returns time-series forecasts for environmental metrics
 """
 
 from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import ORJSONResponse
 from api.schemas import ForecastResponse
 from datetime import datetime, timedelta
-from typing import Optional
+import numpy as np
 
 router = APIRouter()
 
-@router.get("/forecast/{lat}/{lng}", response_model=ForecastResponse)
+@router.get(
+    "/forecast/{lat}/{lng}",
+    response_model=None,
+    responses={200: {"model": ForecastResponse}}
+)
 async def get_forecast(
     lat: float,
     lng: float,
@@ -31,29 +36,38 @@ async def get_forecast(
         # TODO: Implement actual forecasting model
         # For now, return placeholder structure
         
-        # Generate placeholder predictions
-        predictions = []
+        # Generate placeholder predictions every 6 hours
         base_time = datetime.utcnow()
+        hours = np.arange(0, horizon_hours, 6)
+        pm25_trend = hours * 0.1
+        no2_trend = hours * 0.05
         
-        for i in range(0, horizon_hours, 6):  # Every 6 hours
-            timestamp = base_time + timedelta(hours=i)
-            predictions.append({
-                "timestamp": timestamp.isoformat() + "Z",
+        # Bounds from their own base constants (not mean ± 5) so values match
+        # the scalar formulas bit for bit; convert to Python floats in bulk
+        pm25 = ((50.0 + pm25_trend).tolist(), (45.0 + pm25_trend).tolist(), (55.0 + pm25_trend).tolist())
+        no2 = ((30.0 + no2_trend).tolist(), (25.0 + no2_trend).tolist(), (35.0 + no2_trend).tolist())
+        timestamps = [(base_time + timedelta(hours=h)).isoformat() + "Z" for h in hours.tolist()]
+        
+        predictions = [
+            {
+                "timestamp": timestamps[i],
                 "pm25": {
-                    "mean": 50.0 + i * 0.1,
-                    "lower": 45.0 + i * 0.1,
-                    "upper": 55.0 + i * 0.1,
+                    "mean": pm25[0][i],
+                    "lower": pm25[1][i],
+                    "upper": pm25[2][i],
                     "confidence": 0.85
                 },
                 "no2": {
-                    "mean": 30.0 + i * 0.05,
-                    "lower": 25.0 + i * 0.05,
-                    "upper": 35.0 + i * 0.05,
+                    "mean": no2[0][i],
+                    "lower": no2[1][i],
+                    "upper": no2[2][i],
                     "confidence": 0.82
                 }
-            })
+            }
+            for i in range(len(hours))
+        ]
         
-        return {
+        return ORJSONResponse(content={
             "location": [lat, lng],
             "forecast_type": "short_term",
             "horizon_hours": horizon_hours,
@@ -66,7 +80,7 @@ async def get_forecast(
                 "mae": None,
                 "note": "Forecasting model requires historical data and training"
             }
-        }
+        })
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error generating forecast: {str(e)}")
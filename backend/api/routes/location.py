@@ -4,17 +4,32 @@ Returns environmental assessment for a given location
 """
 
 from fastapi import APIRouter, HTTPException
-from typing import Dict
+from fastapi.responses import ORJSONResponse
+from typing import Optional
 from datetime import datetime
-from api.schemas import LocationResponse, SafetyLevel
+from functools import lru_cache
+import asyncio
+from api.schemas import LocationResponse, SafetyLevel, VERDICT_MAP
 from services.data_ingestion import DataIngestionService
 from services.ml_pipeline import RiskScorer, AnomalyDetector
 from services.data_fusion import DataFusionService
+from services.request_coalescer import coalesced_fetch
+from services.batching_dispatcher import BatchingDispatcher
+from services.anomaly_batcher import AnomalyBatcher
+from services.quality import assess_data_quality
+from core.config import settings
 try:
     import reverse_geocoder as rg
 except ImportError:
     rg = None
 
+if rg is not None:
+    try:
+        # Force the cities KDTree to load once at import instead of on first request
+        rg.search((0, 0))
+    except Exception:
+        pass
+
 router = APIRouter()
 
 # Initialize services
@@ -22,8 +37,22 @@ data_ingestion = DataIngestionService()
 risk_scorer = RiskScorer()
 anomaly_detector = AnomalyDetector()
 data_fusion = DataFusionService()
+dispatcher = BatchingDispatcher(data_ingestion)
+anomaly_batcher = AnomalyBatcher(anomaly_detector)
+
+# (source key, response field kind, display name)
+_SOURCE_TABLE = (
+    ("sentinel5p", "satellite", "Sentinel-5P TROPOMI"),
+    ("openaq", "ground", "OpenAQ"),
+    ("cpcb", "ground", "CPCB (India)"),
+    ("weather", "weather", "ERA5"),
+)
 
-@router.get("/location/{lat}/{lng}", response_model=LocationResponse)
+@router.get(
+    "/location/{lat}/{lng}",
+    response_model=None,
+    responses={200: {"model": LocationResponse}}
+)
 async def get_location_assessment(
     lat: float,
     lng: float
@@ -35,25 +64,28 @@ async def get_location_assessment(
         LocationResponse with verdict, metrics, and data sources
     """
     try:
-        # 1. Get location name (reverse geocoding)
-        location_name = await _get_location_name(lat, lng)
-        
-        # 2. Fetch data from all sources
-        raw_data = await data_ingestion.fetch_all_sources(lat, lng)
+        # 1-2. Get location name (reverse geocoding) and fetch data from all sources concurrently
+        location_name, raw_data = await asyncio.gather(
+            _get_location_name(lat, lng),
+            coalesced_fetch(dispatcher.submit, lat, lng)
+        )
         
         # 3. Fuse data from multiple sources
         fused_metrics = await data_fusion.fuse_data(raw_data, lat, lng)
         
-        # 4. Calculate risk score
-        risk_result = risk_scorer.calculate_risk_score(
-            metrics=fused_metrics,
-            historical_trend=None,  # TODO: Fetch from database
-            data_quality=_assess_data_quality(raw_data)
+        # 4-5. Calculate risk score in a worker thread and detect anomalies
+        # through the batcher, which scores concurrent requests in one forest
+        # call off the event loop
+        risk_result, anomaly_result = await asyncio.gather(
+            asyncio.to_thread(
+                risk_scorer.calculate_risk_score,
+                metrics=fused_metrics,
+                historical_trend=None,  # TODO: Fetch from database
+                data_quality=assess_data_quality(raw_data)
+            ),
+            anomaly_batcher.predict(fused_metrics.get("air", {}))
         )
         
-        # 5. Detect anomalies
-        anomaly_result = anomaly_detector.predict(fused_metrics.get("air", {}))
-        
         # 6. Check for plumes (simplified - would need actual detection logic)
         plumes = await _detect_plumes(fused_metrics)
         
@@ -61,7 +93,7 @@ async def get_location_assessment(
         data_timestamps = _extract_timestamps(raw_data)
         
         # 8. Build response
-        return {
+        return ORJSONResponse(content={
             "location": {
                 "lat": lat,
                 "lng": lng,
@@ -70,26 +102,32 @@ async def get_location_assessment(
             "timestamp": datetime.utcnow().isoformat() + "Z",
             "data_timestamp": data_timestamps,
             "verdict": {
-                "level": SafetyLevel(risk_result["verdict"]),
+                "level": VERDICT_MAP.get(risk_result["verdict"], SafetyLevel.MODERATE),
                 "confidence": risk_result["confidence"],
                 "risk_score": risk_result["risk_score"]
             },
             "metrics": fused_metrics,
             "plumes": plumes,
             "sources": _extract_sources(raw_data)
-        }
+        })
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error processing location: {str(e)}")
 
+@lru_cache(maxsize=settings.SEARCH_CACHE_SIZE)
+def _rg_lookup(lat_q: float, lng_q: float) -> Optional[dict]:
+    """Cached reverse geocoder lookup on coordinates rounded to ~10m"""
+    result = rg.search((lat_q, lng_q))
+    return result[0] if result else None
+
 async def _get_location_name(lat: float, lng: float) -> str:
     """Get location name using reverse geocoding"""
     if rg is None:
         return f"Location ({lat:.4f}, {lng:.4f})"
     try:
-        result = rg.search((lat, lng))
-        if result:
-            location = result[0]
+        # KDTree query is CPU-bound, keep it off the event loop
+        location = await asyncio.to_thread(_rg_lookup, round(lat, 4), round(lng, 4))
+        if location:
             parts = []
             if location.get("name"):
                 parts.append(location["name"])
@@ -102,30 +140,6 @@ async def _get_location_name(lat: float, lng: float) -> str:
     except Exception:
         return f"Location ({lat:.4f}, {lng:.4f})"
 
-def _assess_data_quality(raw_data: dict) -> dict:
-    """Assess data quality metrics"""
-    sources = raw_data.get("sources", {})
-    
-    # Calculate coverage (how many sources provided data)
-    total_sources = len(sources)
-    valid_sources = sum(1 for s in sources.values() if "error" not in s)
-    coverage = valid_sources / total_sources if total_sources > 0 else 0.0
-    
-    # Calculate data age (hours)
-    timestamp_str = raw_data.get("timestamp", datetime.utcnow().isoformat() + "Z")
-    try:
-        data_time = datetime.fromisoformat(timestamp_str.replace("Z", "+00:00"))
-        age_hours = (datetime.utcnow() - data_time.replace(tzinfo=None)).total_seconds() / 3600
-    except:
-        age_hours = 0
-    
-    return {
-        "coverage": coverage,
-        "age_hours": age_hours,
-        "valid_sources": valid_sources,
-        "total_sources": total_sources
-    }
-
 async def _detect_plumes(metrics: dict) -> list:
     """Detect pollution plumes (simplified detection logic)"""
     plumes = []
@@ -171,44 +185,22 @@ def _extract_sources(raw_data: dict) -> dict:
     """Extract data source information"""
     sources = raw_data.get("sources", {})
     
-    source_list = []
-    
-    if "sentinel5p" in sources:
-        source_list.append("Sentinel-5P TROPOMI")
-    
-    if "openaq" in sources and sources["openaq"].get("measurements"):
-        source_list.append("OpenAQ")
-    
-    if "cpcb" in sources:
-        source_list.append("CPCB (India)")
-    
-    return {
-        "satellite": "Sentinel-5P TROPOMI" if "sentinel5p" in sources else None,
-        "ground_sensors": source_list,
-        "weather": "ERA5" if "weather" in sources else None
+    extracted = {
+        "satellite": None,
+        "ground_sensors": [],
+        "weather": None
     }
-
-def _assess_data_quality(raw_data: dict) -> dict:
-    """Assess data quality metrics"""
-    sources = raw_data.get("sources", {})
-    
-    # Calculate coverage (how many sources provided data)
-    total_sources = len(sources)
-    valid_sources = sum(1 for s in sources.values() if "error" not in s)
-    coverage = valid_sources / total_sources if total_sources > 0 else 0.0
-    
-    # Calculate data age (hours)
-    timestamp_str = raw_data.get("timestamp", datetime.utcnow().isoformat() + "Z")
-    try:
-        data_time = datetime.fromisoformat(timestamp_str.replace("Z", "+00:00"))
-        age_hours = (datetime.utcnow() - data_time.replace(tzinfo=None)).total_seconds() / 3600
-    except:
-        age_hours = 0
     
-    return {
-        "coverage": coverage,
-        "age_hours": age_hours,
-        "valid_sources": valid_sources,
-        "total_sources": total_sources
-    }
-
+    for source_key, kind, pretty_name in _SOURCE_TABLE:
+        source = sources.get(source_key)
+        if source is None:
+            continue
+        if kind == "ground":
+            # Only list ground networks that actually returned readings
+            if source_key == "openaq" and not source.get("measurements"):
+                continue
+            extracted["ground_sensors"].append(pretty_name)
+        else:
+            extracted[kind] = pretty_name
+    
+    return extracted
@@ -3,53 +3,81 @@ Search API endpoints
 Geocoding and location search
 """
 
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, HTTPException, Query, Request
 from typing import List, Dict
+from cachetools import TTLCache
+import asyncio
 import httpx
+from services.request_coalescer import coalesce
 
 router = APIRouter()
 
+# Formatted Nominatim results keyed by normalized query
+_search_cache: TTLCache = TTLCache(maxsize=4096, ttl=3600)
+_search_cache_lock = asyncio.Lock()
+
 @router.get("/search")
-async def search_location(q: str = Query(..., description="Search query")):
+async def search_location(
+    request: Request,
+    q: str = Query(..., description="Search query")
+):
     """
     Search for locations using geocoding
     
     Uses Nominatim (OpenStreetMap) for geocoding
     """
+    key = q.strip().lower()
+    
+    async with _search_cache_lock:
+        cached = _search_cache.get(key)
+    if cached is not None:
+        return {"results": cached}
+    
     try:
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            # Use Nominatim for geocoding
-            response = await client.get(
-                "https://nominatim.openstreetmap.org/search",
-                params={
-                    "q": q,
-                    "format": "json",
-                    "limit": 10,
-                    "addressdetails": 1
-                },
-                headers={
-                    "User-Agent": "Environmental Safety Platform"  # Required by Nominatim
-                }
-            )
-            response.raise_for_status()
-            
-            results = response.json()
-            
-            # Format results
-            formatted_results = []
-            for result in results:
-                formatted_results.append({
-                    "name": result.get("display_name", ""),
-                    "lat": float(result.get("lat", 0)),
-                    "lng": float(result.get("lon", 0)),
-                    "type": result.get("type", ""),
-                    "importance": result.get("importance", 0)
-                })
-            
-            return {"results": formatted_results}
-            
+        # Identical in-flight queries share one Nominatim call (rate-limited to 1 req/s)
+        formatted_results = await coalesce(
+            ("search", key),
+            lambda: _nominatim_search(request.app.state.http, q)
+        )
+        
+        async with _search_cache_lock:
+            _search_cache[key] = formatted_results
+        
+        return {"results": formatted_results}
+    
     except httpx.HTTPError as e:
         raise HTTPException(status_code=500, detail=f"Geocoding service error: {str(e)}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error searching location: {str(e)}")
 
+async def _nominatim_search(client: httpx.AsyncClient, q: str) -> List[Dict]:
+    """Query Nominatim and format the results"""
+    # Use Nominatim for geocoding
+    response = await client.get(
+        "https://nominatim.openstreetmap.org/search",
+        params={
+            "q": q,
+            "format": "json",
+            "limit": 10,
+            "addressdetails": 1
+        },
+        headers={
+            "User-Agent": "Environmental Safety Platform"  # Required by Nominatim
+        }
+    )
+    response.raise_for_status()
+    
+    results = response.json()
+    
+    # Format results
+    formatted_results = []
+    for result in results:
+        formatted_results.append({
+            "name": result.get("display_name", ""),
+            "lat": float(result.get("lat", 0)),
+            "lng": float(result.get("lon", 0)),
+            "type": result.get("type", ""),
+            "importance": result.get("importance", 0)
+        })
+    
+    return formatted_results
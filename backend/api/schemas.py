@@ -2,7 +2,7 @@
 Pydantic schemas for API request/response models
 """
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 from typing import List, Optional, Dict, Any
 from datetime import datetime
 from enum import Enum
@@ -12,6 +12,9 @@ class SafetyLevel(str, Enum):
     MODERATE = "MODERATE"
     UNSAFE = "UNSAFE"
 
+# Verdict string -> SafetyLevel, avoids Enum value validation per request
+VERDICT_MAP = {e.value: e for e in SafetyLevel}
+
 class PollutantType(str, Enum):
     PM25 = "pm25"
     PM10 = "pm10"
@@ -47,6 +50,8 @@ class PlumeDetection(BaseModel):
     source_estimate: Optional[Dict[str, Any]] = None
 
 class LocationResponse(BaseModel):
+    model_config = ConfigDict(defer_build=False, validate_assignment=False)
+    
     location: Dict[str, Any]
     timestamp: datetime
     data_timestamp: DataTimestamp
@@ -72,6 +77,8 @@ class TechnicalMetric(BaseModel):
     spatial_resolution_km: Optional[float] = None
 
 class AnalysisResponse(BaseModel):
+    model_config = ConfigDict(defer_build=False, validate_assignment=False)
+    
     human_readable: HumanReadableReason
     technical: Dict[str, Any]
     model_info: Dict[str, Any]
@@ -82,6 +89,8 @@ class ForecastPoint(BaseModel):
     confidence: float
 
 class ForecastResponse(BaseModel):
+    model_config = ConfigDict(defer_build=False, validate_assignment=False)
+    
     location: List[float]
     forecast_type: str
     horizon_hours: int
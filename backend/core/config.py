@@ -13,6 +13,7 @@ class Settings(BaseSettings):
     # API Settings
     API_V1_STR: str = "/api/v1"
     DEBUG: bool = os.getenv("DEBUG", "False").lower() == "true"
+    LOG_LEVEL: str = os.getenv("LOG_LEVEL", "DEBUG" if DEBUG else "INFO")
     
     # CORS
     CORS_ORIGINS: List[str] = [
@@ -33,6 +34,7 @@ class Settings(BaseSettings):
     
     # Data Sources Configuration
     SENTINEL5P_MAX_AGE_DAYS: int = 7  # Consider data stale after 7 days
+    SENTINEL5P_CACHE_DIR: str = os.getenv("SENTINEL5P_CACHE_DIR", "/var/cache/evs/s5p")
     GROUND_SENSOR_MAX_AGE_HOURS: int = 24
     WEATHER_DATA_MAX_AGE_HOURS: int = 6
     
@@ -40,11 +42,21 @@ class Settings(BaseSettings):
     RISK_MODEL_VERSION: str = "1.0.0"
     FORECAST_HORIZON_HOURS: int = 48
     ANOMALY_DETECTION_WARNING_DAYS: int = 30
+    ANOMALY_MODEL_CACHE_DIR: str = os.getenv("ANOMALY_MODEL_CACHE_DIR", "/var/cache/evs/anomaly")
     
     # Spatial Settings
     DEFAULT_GRID_RESOLUTION_KM: float = 1.0  # 1km grid for data fusion
     GROUND_SENSOR_SEARCH_RADIUS_KM: float = 50.0
     
+    # Caching
+    SEARCH_CACHE_SIZE: int = 8192  # Max cached reverse geocoder lookups
+    
+    # Request batching
+    BATCH_MAX: int = 32  # Max requests drained per batch window
+    BATCH_WAIT_MS: int = 75  # Batch window length
+    ANOMALY_BATCH_MAX: int = 64  # Max anomaly predictions scored per model call
+    ANOMALY_BATCH_WAIT_MS: int = 2  # Anomaly scoring batch window length
+    
     class Config:
         case_sensitive = True
 
@@ -0,0 +1,53 @@
+"""
+Logging configuration
+Log records are handed to a background thread so handlers never block the event loop
+"""
+
+import logging
+import logging.handlers
+import queue
+from typing import Optional
+from core.config import settings
+
+# Per-request INFO chatter from the HTTP client stack
+QUIET_LOGGERS = ("httpx", "httpcore")
+
+_queue_handler: Optional[logging.handlers.QueueHandler] = None
+_listener: Optional[logging.handlers.QueueListener] = None
+
+def setup_logging():
+    """
+    Route root logger output through a QueueHandler/QueueListener pair
+    
+    Idempotent; call shutdown_logging() on shutdown to flush pending records
+    """
+    global _queue_handler, _listener
+    if _listener is not None:
+        return
+    
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    
+    root = logging.getLogger()
+    root.setLevel(settings.LOG_LEVEL)
+    for name in QUIET_LOGGERS:
+        logging.getLogger(name).setLevel(logging.WARNING)
+    
+    _queue_handler = logging.handlers.QueueHandler(log_queue)
+    root.addHandler(_queue_handler)
+    
+    _listener = logging.handlers.QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+
+def shutdown_logging():
+    """Flush queued records, stop the listener and detach the queue handler"""
+    global _queue_handler, _listener
+    if _listener is None:
+        return
+    
+    logging.getLogger().removeHandler(_queue_handler)
+    _listener.stop()
+    _queue_handler = None
+    _listener = None
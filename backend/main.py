@@ -3,22 +3,54 @@ Environmental Safety Platform - FastAPI Backend
 Production-grade API for real-time environmental intelligence
 """
 
-from fastapi import FastAPI, HTTPException, Query
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-from typing import Optional
-from datetime import datetime, timedelta
+from fastapi.responses import ORJSONResponse, Response
+from starlette.datastructures import MutableHeaders
+from datetime import datetime
+from contextlib import asynccontextmanager
+import hashlib
+import httpx
+import orjson
 import uvicorn
+try:
+    import xxhash
+except ImportError:
+    xxhash = None
 
 from api.routes import location, analysis, forecast, search
 from core.config import settings
+from core.logging_config import setup_logging, shutdown_logging
+from services import _fusion_kernels
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Application startup/shutdown: logging, shared HTTP clients and kernel warm-up"""
+    setup_logging()
+    
+    # Pay the Numba JIT cost once at startup instead of on the first request
+    _fusion_kernels.warm_up()
+    
+    # Pooled keep-alive client shared by outbound API calls
+    app.state.http = httpx.AsyncClient(
+        http2=True,
+        timeout=10.0,
+        limits=httpx.Limits(max_keepalive_connections=20)
+    )
+    yield
+    await app.state.http.aclose()
+    await location.data_ingestion.close()
+    await analysis.data_ingestion.close()
+    shutdown_logging()
 
 app = FastAPI(
     title="Environmental Safety Platform API",
     description="Real-time environmental intelligence and habitability risk assessment",
     version="1.0.0",
     docs_url="/api/docs",
-    redoc_url="/api/redoc"
+    redoc_url="/api/redoc",
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan
 )
 
 # CORS middleware
@@ -30,6 +62,86 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# HTTP caching: environmental data is stable for minutes at a given location
+CACHE_CONTROL = "public, max-age=60, stale-while-revalidate=300"
+# Cached routes (by path prefix) and the generation-time clock readings in
+# their bodies, left out of the ETag so unchanged data revalidates; "*"
+# matches every key of an object
+ETAG_VOLATILE_PATHS = {
+    f"{settings.API_V1_STR}/location/": (
+        ("timestamp",),
+        # Fallbacks to the current time until these sources report their own
+        ("data_timestamp", "water_quality"),
+        ("data_timestamp", "land"),
+        ("data_timestamp", "meteorology"),
+    ),
+    f"{settings.API_V1_STR}/analysis/": (
+        ("model_info", "timestamp"),
+        ("technical", "air_quality", "*", "measurement_timestamp"),
+    ),
+    f"{settings.API_V1_STR}/forecast/": (
+        ("generated_at",),
+    ),
+}
+
+def _drop_path(value, path):
+    """Remove the key at path from a decoded JSON object, in place"""
+    if not isinstance(value, dict):
+        return
+    key, rest = path[0], path[1:]
+    children = list(value.values()) if key == "*" else [value.get(key)]
+    if not rest:
+        if key == "*":
+            value.clear()
+        else:
+            value.pop(key, None)
+        return
+    for child in children:
+        _drop_path(child, rest)
+
+def _body_etag(body: bytes, volatile_paths) -> str:
+    """Weak ETag derived from a fast hash of the response content, ignoring clock fields"""
+    try:
+        content = orjson.loads(body)
+        for path in volatile_paths:
+            _drop_path(content, path)
+        body = orjson.dumps(content)
+    except orjson.JSONDecodeError:
+        pass  # Hash the raw bytes
+    if xxhash is not None:
+        digest = xxhash.xxh64(body).hexdigest()
+    else:
+        digest = hashlib.blake2b(body, digest_size=8).hexdigest()
+    return f'W/"{digest}"'
+
+@app.middleware("http")
+async def http_cache_headers(request: Request, call_next):
+    """Add ETag/Cache-Control to cacheable GET responses and answer revalidations with 304"""
+    response = await call_next(request)
+    if request.method != "GET" or response.status_code != 200:
+        return response
+    volatile_paths = next(
+        (paths for prefix, paths in ETAG_VOLATILE_PATHS.items() if request.url.path.startswith(prefix)),
+        None
+    )
+    if volatile_paths is None:
+        return response
+    
+    body = b"".join([chunk async for chunk in response.body_iterator])
+    etag = _body_etag(body, volatile_paths)
+    # Copy the raw header list so repeated headers (e.g. set-cookie) survive
+    headers = MutableHeaders(raw=list(response.headers.raw))
+    headers["etag"] = etag
+    headers["cache-control"] = CACHE_CONTROL
+    
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and (if_none_match.strip() == "*" or etag in [t.strip() for t in if_none_match.split(",")]):
+        del headers["content-length"]
+        del headers["content-type"]
+        return Response(status_code=304, headers=headers)
+    
+    return Response(content=body, status_code=response.status_code, headers=headers)
+
 # Include routers
 app.include_router(location.router, prefix="/api/v1", tags=["Location"])
 app.include_router(analysis.router, prefix="/api/v1", tags=["Analysis"])
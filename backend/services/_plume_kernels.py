@@ -0,0 +1,60 @@
+"""
+Numeric kernels for plume back-tracing
+JIT-compiled with Numba when available, plain Python/NumPy otherwise
+"""
+
+import numpy as np
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+METERS_PER_DEG_LAT = 111320.0
+
+def _backtrace(lat0, lng0, wind, grid_lat0, grid_lng0, grid_res_deg, n_particles, hours, dt_s, sigma_m):
+    """
+    Lagrangian backward trajectories of particles released at (lat0, lng0)
+
+    wind is a (hours, H, W, 2) array of u/v components (m/s) on a regular
+    lat/lng grid whose [0, 0] cell is at (grid_lat0, grid_lng0); index 0 on
+    the first axis is the detection hour, later indices go back in time.
+    Returns an (n_particles, 2) array of final (lat, lng) positions.
+    """
+    n_hours = min(hours, wind.shape[0])
+    n_rows = wind.shape[1]
+    n_cols = wind.shape[2]
+    positions = np.empty((n_particles, 2))
+
+    for p in range(n_particles):
+        lat = lat0
+        lng = lng0
+        for h in range(n_hours):
+            # Nearest-neighbour wind sample
+            i = int(np.floor((lat - grid_lat0) / grid_res_deg + 0.5))
+            j = int(np.floor((lng - grid_lng0) / grid_res_deg + 0.5))
+            i = min(max(i, 0), n_rows - 1)
+            j = min(max(j, 0), n_cols - 1)
+            u = wind[h, i, j, 0]
+            v = wind[h, i, j, 1]
+
+            # Step backward in time (against the wind) plus turbulent diffusion
+            dx = -u * dt_s + np.random.randn() * sigma_m
+            dy = -v * dt_s + np.random.randn() * sigma_m
+            lat += dy / METERS_PER_DEG_LAT
+            lng += dx / (METERS_PER_DEG_LAT * max(np.cos(np.radians(lat)), 1e-6))
+
+        positions[p, 0] = lat
+        positions[p, 1] = lng
+
+    return positions
+
+# Serial kernel: trace_plume calls it from asyncio worker threads, and Numba's
+# default workqueue threading layer aborts on concurrent parallel launches
+if njit is not None:
+    backtrace = njit(fastmath=True, cache=True)(_backtrace)
+else:
+    backtrace = _backtrace
+
+def warm_up():
+    """Compile kernels ahead of the first request (no-op without Numba)"""
+    backtrace(0.0, 0.0, np.zeros((1, 1, 1, 2), dtype=np.float32), 0.0, 0.0, 1.0, 1, 1, 3600.0, 0.0)
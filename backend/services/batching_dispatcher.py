@@ -0,0 +1,103 @@
+"""
+Batching Dispatcher
+Groups nearby location requests arriving within a short window into one upstream fetch
+"""
+
+import asyncio
+import math
+from collections import defaultdict
+from typing import Dict, List, Optional, Set, Tuple
+from core.config import settings
+from services.data_ingestion import DataIngestionService
+
+class BatchingDispatcher:
+    """
+    Micro-batch window in front of DataIngestionService
+
+    Requests queued within the window are bucketed into 0.1° cells; each
+    cell issues a single ground sensor query and results are scattered back
+    to the callers through per-request futures.
+    """
+
+    def __init__(
+        self,
+        data_ingestion: DataIngestionService,
+        max_batch: int = settings.BATCH_MAX,
+        wait_ms: int = settings.BATCH_WAIT_MS
+    ):
+        self.data_ingestion = data_ingestion
+        self.max_batch = max_batch
+        self.wait_s = wait_ms / 1000.0
+        self._queue: Optional[asyncio.Queue] = None
+        self._consumer: Optional[asyncio.Task] = None
+        self._dispatches: Set[asyncio.Task] = set()
+
+    async def submit(self, lat: float, lng: float) -> Dict:
+        """Queue a location and wait for its fetch_all_sources-shaped result"""
+        # Consumer is started lazily so it binds to the running event loop
+        if self._consumer is None or self._consumer.done():
+            self._queue = asyncio.Queue()
+            self._consumer = asyncio.create_task(self._run())
+
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((lat, lng, future))
+        return await future
+
+    async def _run(self):
+        """Drain the queue in windows and dispatch each geo-bucket"""
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+
+            # Let requests already scheduled on the loop enqueue; a lone request
+            # is dispatched at once instead of paying for the whole window
+            await asyncio.sleep(0)
+            if self._queue.empty():
+                self._spawn_dispatch(batch)
+                continue
+
+            deadline = loop.time() + self.wait_s
+
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            clusters = defaultdict(list)
+            for item in batch:
+                lat, lng, _ = item
+                clusters[(math.floor(lat * 10), math.floor(lng * 10))].append(item)
+
+            for items in clusters.values():
+                self._spawn_dispatch(items)
+
+    def _spawn_dispatch(self, items: List[Tuple[float, float, asyncio.Future]]):
+        """Dispatch without blocking the next window"""
+        # Keep references so the tasks aren't garbage collected mid-flight
+        task = asyncio.create_task(self._dispatch(items))
+        self._dispatches.add(task)
+        task.add_done_callback(self._dispatches.discard)
+
+    async def _dispatch(self, items: List[Tuple[float, float, asyncio.Future]]):
+        """Fetch one cluster and resolve its callers' futures"""
+        try:
+            if len(items) == 1:
+                lat, lng, _ = items[0]
+                results = [await self.data_ingestion.fetch_all_sources(lat, lng)]
+            else:
+                results = await self.data_ingestion.fetch_cluster(
+                    [(lat, lng) for lat, lng, _ in items]
+                )
+        except Exception as e:
+            for _, _, future in items:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, _, future), result in zip(items, results):
+            if not future.done():
+                future.set_result(result)
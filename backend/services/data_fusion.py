@@ -5,6 +5,17 @@ Combines data from multiple sources (satellite, ground sensors, weather)
 
 from typing import Dict
 import numpy as np
+from services._fusion_kernels import weighted_group_mean
+
+# Integer codes for the pollutants fused from ground and satellite data
+_POLLUTANT_CODES = {"pm25": 0, "no2": 1, "so2": 2}
+
+# WHO 24h guidelines (μg/m³)
+_WHO_24H_THRESHOLDS = {"pm25": 45.0, "no2": 200.0, "so2": 40.0}
+
+# Rough Sentinel-5P column density conversion factors, mol/m² -> μg/m³
+_NO2_MOL_TO_UGM3 = 1e6 * 46.01 / 6.022e23 * 1e12
+_SO2_MOL_TO_UGM3 = 1e6 * 64.07 / 6.022e23 * 1e12
 
 class DataFusionService:
     """Fuse data from multiple sources with weighted confidence"""
@@ -57,80 +68,68 @@ class DataFusionService:
         # Extract satellite data (Sentinel-5P)
         sentinel_data = sources.get("sentinel5p", {})
         
-        # Fuse PM2.5
-        pm25_values = []
-        pm25_weights = []
+        ground_weight = self.weights["ground_sensor"]
+        satellite_weight = self.weights["satellite"]
         
-        # From OpenAQ
+        # Single pass over ground measurements into parallel code/value/weight arrays
+        codes = []
+        values = []
+        weights = []
         for meas in measurements:
-            if meas.get("parameter") == "pm25" and meas.get("value") is not None:
-                pm25_values.append(meas["value"])
-                pm25_weights.append(self.weights["ground_sensor"])
-        
-        if pm25_values:
-            fused_pm25 = np.average(pm25_values, weights=pm25_weights)
-            metrics["pm25"] = {
-                "value": float(fused_pm25),
+            code = _POLLUTANT_CODES.get(meas.get("parameter"))
+            value = meas.get("value")
+            if code is not None and value is not None:
+                codes.append(code)
+                values.append(value)
+                weights.append(ground_weight)
+        ground_codes = set(codes)
+        
+        # Satellite column densities (Sentinel-5P)
+        satellite_codes = set()
+        for pollutant, mol_to_ugm3 in (("no2", _NO2_MOL_TO_UGM3), ("so2", _SO2_MOL_TO_UGM3)):
+            if pollutant in sentinel_data and sentinel_data[pollutant].get("value"):
+                code = _POLLUTANT_CODES[pollutant]
+                codes.append(code)
+                values.append(self._convert_column_density(sentinel_data[pollutant]["value"], mol_to_ugm3))
+                weights.append(satellite_weight)
+                satellite_codes.add(code)
+        
+        # Per-pollutant weighted means in one reduction
+        fused = weighted_group_mean(
+            np.asarray(codes, dtype=np.int64),
+            np.asarray(values, dtype=np.float64),
+            np.asarray(weights, dtype=np.float64),
+            len(_POLLUTANT_CODES)
+        )
+        
+        for pollutant, code in _POLLUTANT_CODES.items():
+            has_ground = code in ground_codes
+            has_satellite = code in satellite_codes
+            if not (has_ground or has_satellite):
+                continue
+            
+            if has_ground and has_satellite:
+                source, source_kind = "Fused (OpenAQ + Sentinel-5P)", "fused"
+            elif has_ground:
+                source, source_kind = "OpenAQ", "ground"
+            else:
+                source, source_kind = "Sentinel-5P", "satellite"
+            
+            metrics[pollutant] = {
+                "value": float(fused[code]),
                 "unit": "μg/m³",
-                "threshold": 45.0,  # WHO 24h guideline
-                "source": "OpenAQ"
-            }
-        
-        # Fuse NO2
-        no2_values = []
-        no2_weights = []
-        
-        # From OpenAQ
-        for meas in measurements:
-            if meas.get("parameter") == "no2" and meas.get("value") is not None:
-                no2_values.append(meas["value"])
-                no2_weights.append(self.weights["ground_sensor"])
-        
-        # From Sentinel-5P
-        if "no2" in sentinel_data and sentinel_data["no2"].get("value"):
-            # Convert from mol/m² to μg/m³ (simplified conversion)
-            no2_mol = sentinel_data["no2"]["value"]
-            no2_ug = no2_mol * 1e6 * 46.01 / 6.022e23 * 1e12  # Rough conversion
-            no2_values.append(no2_ug)
-            no2_weights.append(self.weights["satellite"])
-        
-        if no2_values:
-            fused_no2 = np.average(no2_values, weights=no2_weights)
-            metrics["no2"] = {
-                "value": float(fused_no2),
-                "unit": "μg/m³",
-                "threshold": 200.0,  # WHO 24h guideline
-                "source": "Fused (OpenAQ + Sentinel-5P)" if len(no2_values) > 1 else "OpenAQ" if measurements else "Sentinel-5P"
-            }
-        
-        # Fuse SO2
-        so2_values = []
-        so2_weights = []
-        
-        # From OpenAQ
-        for meas in measurements:
-            if meas.get("parameter") == "so2" and meas.get("value") is not None:
-                so2_values.append(meas["value"])
-                so2_weights.append(self.weights["ground_sensor"])
-        
-        # From Sentinel-5P
-        if "so2" in sentinel_data and sentinel_data["so2"].get("value"):
-            so2_mol = sentinel_data["so2"]["value"]
-            so2_ug = so2_mol * 1e6 * 64.07 / 6.022e23 * 1e12  # Rough conversion
-            so2_values.append(so2_ug)
-            so2_weights.append(self.weights["satellite"])
-        
-        if so2_values:
-            fused_so2 = np.average(so2_values, weights=so2_weights)
-            metrics["so2"] = {
-                "value": float(fused_so2),
-                "unit": "μg/m³",
-                "threshold": 40.0,  # WHO 24h guideline
-                "source": "Fused (OpenAQ + Sentinel-5P)" if len(so2_values) > 1 else "OpenAQ" if measurements else "Sentinel-5P"
+                "threshold": _WHO_24H_THRESHOLDS[pollutant],
+                "source": source,
+                "source_kind": source_kind
             }
         
         return metrics
     
+    @staticmethod
+    def _convert_column_density(mol: float, mol_to_ugm3: float) -> float:
+        """Convert a column density from mol/m² to μg/m³ (simplified conversion)"""
+        return mol * mol_to_ugm3
+    
     def _fuse_water_quality(self, sources: Dict) -> Dict:
         """Fuse water quality data (placeholder - would process Sentinel-2)"""
         return {
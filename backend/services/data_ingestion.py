@@ -5,22 +5,95 @@ Fetches real data from various sources: OpenAQ, Sentinel-5P, etc.
 
 import httpx
 import asyncio
-from typing import Dict, List, Optional, Tuple
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
 from datetime import datetime, timedelta
-import json
+from cachetools import TTLCache
+import math
+import logging
+import threading
+import orjson
+try:
+    import diskcache
+except ImportError:
+    diskcache = None
+try:
+    import ijson
+except ImportError:
+    ijson = None
 from core.config import settings
+from services.request_coalescer import coalesce
+
+logger = logging.getLogger(__name__)
+
+# Upstream response caches keyed by coordinates rounded to ~1km
+_openaq_cache: TTLCache = TTLCache(maxsize=1024, ttl=300)
+_sentinel5p_cache: TTLCache = TTLCache(maxsize=1024, ttl=3600)  # Satellite data changes daily
+
+async def _cached_fetch(cache: TTLCache, key: Tuple, fetch: Callable[[], Awaitable[Dict]]) -> Dict:
+    """
+    Return a cached upstream response, fetching and caching it on a miss
+    
+    Concurrent misses for the same key share one in-flight upstream call
+    (singleflight), which then fills the cache. Error responses aren't cached.
+    """
+    # Single lookup: a contains-then-get pair can race the TTL expiry
+    cached = cache.get(key)
+    if cached is not None:
+        return cached
+    
+    async def fetch_and_store() -> Dict:
+        result = await fetch()
+        if "error" not in result:
+            cache[key] = result
+        return result
+    
+    return await coalesce(key, fetch_and_store)
+
+# Bodies below this size are cheaper to decode in one go than to stream
+_STREAM_MIN_BYTES = 64 * 1024
+
+class _AsyncByteReader:
+    """Async file-like read() over an httpx byte stream, as consumed by ijson"""
+    
+    def __init__(self, response: httpx.Response):
+        self._chunks = response.aiter_bytes()
+        self._buffer = b""
+    
+    async def read(self, size: int = -1) -> bytes:
+        while size < 0 or len(self._buffer) < size:
+            try:
+                self._buffer += await self._chunks.__anext__()
+            except StopAsyncIteration:
+                break
+        if size < 0:
+            size = len(self._buffer)
+        data, self._buffer = self._buffer[:size], self._buffer[size:]
+        return data
+
+def _haversine_km(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    """Great-circle distance between two points in kilometers"""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(lng2 - lng1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * 6371.0 * math.asin(math.sqrt(a))
 
 class OpenAQService:
     """OpenAQ API client for global ground sensor data"""
     
     BASE_URL = "https://api.openaq.org/v2"
+    MAX_LOCATIONS = 10  # Closest stations queried for latest measurements
+    
+    def __init__(self, client: httpx.AsyncClient):
+        self.client = client
     
     async def get_latest_measurements(
         self,
         lat: float,
         lng: float,
         radius_km: float = 50.0,
-        parameters: List[str] = ["pm25", "pm10", "no2", "so2", "o3", "co"]
+        parameters: List[str] = ["pm25", "pm10", "no2", "so2", "o3", "co"],
+        max_locations: int = MAX_LOCATIONS
     ) -> Dict:
         """
         Get latest measurements from OpenAQ stations near a location
@@ -30,67 +103,103 @@ class OpenAQService:
             lng: Longitude
             radius_km: Search radius in kilometers
             parameters: List of pollutants to fetch
+            max_locations: Number of closest stations to fetch measurements for
         
         Returns:
             Dict with measurements data
         """
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            try:
-                # OpenAQ v2 API - locations endpoint
-                params = {
-                    "coordinates": f"{lat},{lng}",
-                    "radius": int(radius_km * 1000),  # Convert to meters
-                    "limit": 100,
-                    "order_by": "distance"
-                }
-                
-                response = await client.get(f"{self.BASE_URL}/locations", params=params)
+        # Round the radius up so a cached entry always covers the requested area
+        radius_km = math.ceil(radius_km)
+        key = ("openaq", round(lat, 2), round(lng, 2), radius_km, tuple(parameters), max_locations)
+        return await _cached_fetch(
+            _openaq_cache, key,
+            lambda: self._fetch_latest_measurements(lat, lng, radius_km, parameters, max_locations)
+        )
+    
+    async def _fetch_latest_measurements(
+        self,
+        lat: float,
+        lng: float,
+        radius_km: float,
+        parameters: List[str],
+        max_locations: int
+    ) -> Dict:
+        """Fetch latest measurements from the OpenAQ API (uncached)"""
+        client = self.client
+        try:
+            # OpenAQ v2 API - locations endpoint
+            params = {
+                "coordinates": f"{lat},{lng}",
+                "radius": int(radius_km * 1000),  # Convert to meters
+                "limit": max(100, max_locations),
+                "order_by": "distance"
+            }
+            
+            # Only results[].id is used, so stream large bodies instead of decoding them
+            async with client.stream("GET", f"{self.BASE_URL}/locations", params=params) as response:
                 response.raise_for_status()
-                
-                locations_data = response.json()
-                
-                # Get measurements for each location
-                measurements = []
-                for location in locations_data.get("results", [])[:10]:  # Top 10 closest
-                    location_id = location.get("id")
-                    if not location_id:
-                        continue
-                    
-                    # Fetch latest measurements
-                    for param in parameters:
-                        try:
-                            meas_response = await client.get(
-                                f"{self.BASE_URL}/locations/{location_id}/latest",
-                                params={"parameter": param}
-                            )
-                            if meas_response.status_code == 200:
-                                data = meas_response.json()
-                                measurements.extend(data.get("results", []))
-                        except Exception as e:
-                            print(f"Error fetching {param} for location {location_id}: {e}")
-                            continue
-                
-                return {
-                    "source": "OpenAQ",
-                    "timestamp": datetime.utcnow().isoformat() + "Z",
-                    "measurements": measurements,
-                    "locations_count": len(locations_data.get("results", []))
-                }
-                
-            except httpx.HTTPError as e:
-                print(f"OpenAQ API error: {e}")
-                return {
-                    "source": "OpenAQ",
-                    "error": str(e),
-                    "measurements": []
-                }
-            except Exception as e:
-                print(f"Unexpected error in OpenAQ service: {e}")
-                return {
-                    "source": "OpenAQ",
-                    "error": str(e),
-                    "measurements": []
-                }
+                all_ids = await self._read_location_ids(response)
+            
+            # Closest locations
+            location_ids = [location_id for location_id in all_ids[:max_locations] if location_id]
+            
+            # Fetch latest measurements concurrently, one call per location
+            # requesting every pollutant via repeated parameter args
+            parameter_params = [("parameter", param) for param in parameters]
+            responses = await asyncio.gather(*(
+                client.get(
+                    f"{self.BASE_URL}/locations/{location_id}/latest",
+                    params=parameter_params
+                )
+                for location_id in location_ids
+            ), return_exceptions=True)
+            
+            measurements = []
+            for location_id, meas_response in zip(location_ids, responses):
+                try:
+                    if isinstance(meas_response, Exception):
+                        raise meas_response
+                    if meas_response.status_code == 200:
+                        data = orjson.loads(meas_response.content)
+                        measurements.extend(data.get("results", []))
+                except Exception as e:
+                    logger.warning("Error fetching latest measurements for location %s: %s", location_id, e)
+                    continue
+            
+            return {
+                "source": "OpenAQ",
+                "timestamp": datetime.utcnow().isoformat() + "Z",
+                "measurements": measurements,
+                "locations_count": len(all_ids)
+            }
+            
+        except httpx.HTTPError as e:
+            logger.warning("OpenAQ API error: %s", e)
+            return {
+                "source": "OpenAQ",
+                "error": str(e),
+                "measurements": []
+            }
+        except Exception as e:
+            logger.exception("Unexpected error in OpenAQ service")
+            return {
+                "source": "OpenAQ",
+                "error": str(e),
+                "measurements": []
+            }
+
+    @staticmethod
+    async def _read_location_ids(response: httpx.Response) -> List:
+        """Extract results[].id from a /locations response"""
+        content_length = response.headers.get("content-length")
+        if ijson is None or (content_length is not None and int(content_length) < _STREAM_MIN_BYTES):
+            await response.aread()
+            return [location.get("id") for location in orjson.loads(response.content).get("results", [])]
+        
+        return [
+            location_id
+            async for location_id in ijson.items(_AsyncByteReader(response), "results.item.id")
+        ]
 
 class Sentinel5PService:
     """
@@ -98,9 +207,13 @@ class Sentinel5PService:
     Uses Google Earth Engine API for satellite data access
     """
     
+    PRODUCT = "OFFL L3"
+    
     def __init__(self):
         self.ee = None
         self.initialized = False
+        self._disk_cache = None
+        self._disk_cache_lock = threading.Lock()  # Opened from worker threads
     
     def initialize(self):
         """Initialize Earth Engine (requires credentials)"""
@@ -112,13 +225,13 @@ class Sentinel5PService:
                     ee.Initialize()
                 except Exception:
                     # If not initialized, user needs to authenticate
-                    print("Warning: Earth Engine not authenticated. Run 'earthengine authenticate'")
+                    logger.warning("Earth Engine not authenticated. Run 'earthengine authenticate'")
                     return False
                 self.ee = ee
                 self.initialized = True
             return True
         except ImportError:
-            print("Warning: earthengine-api not installed")
+            logger.warning("earthengine-api not installed")
             return False
     
     async def get_air_quality(
@@ -142,6 +255,21 @@ class Sentinel5PService:
         Returns:
             Dict with NO2, SO2, CO, CH4, Aerosol Index data
         """
+        key = ("sentinel5p", round(lat, 2), round(lng, 2), buffer_km, date_start, date_end)
+        return await _cached_fetch(
+            _sentinel5p_cache, key,
+            lambda: self._fetch_air_quality(lat, lng, date_start, date_end, buffer_km)
+        )
+    
+    async def _fetch_air_quality(
+        self,
+        lat: float,
+        lng: float,
+        date_start: Optional[datetime],
+        date_end: Optional[datetime],
+        buffer_km: float
+    ) -> Dict:
+        """Fetch Sentinel-5P air quality data from Earth Engine (uncached)"""
         if not self.initialize():
             return {
                 "source": "Sentinel-5P",
@@ -155,37 +283,31 @@ class Sentinel5PService:
             if date_start is None:
                 date_start = date_end - timedelta(days=7)
             
-            point = self.ee.Geometry.Point([lng, lat])
-            region = point.buffer(buffer_km * 1000)  # Convert km to meters
-            
-            # Get NO2 data
-            no2_collection = (
-                self.ee.ImageCollection('COPERNICUS/S5P/OFFL/L3_NO2')
-                .filterDate(date_start.strftime('%Y-%m-%d'), date_end.strftime('%Y-%m-%d'))
-                .filterBounds(region)
-                .select('NO2_column_number_density')
-            )
+            date_start_str = date_start.strftime('%Y-%m-%d')
+            date_end_str = date_end.strftime('%Y-%m-%d')
             
-            # Get SO2 data
-            so2_collection = (
-                self.ee.ImageCollection('COPERNICUS/S5P/OFFL/L3_SO2')
-                .filterDate(date_start.strftime('%Y-%m-%d'), date_end.strftime('%Y-%m-%d'))
-                .filterBounds(region)
-                .select('SO2_column_number_density')
-            )
+            # Reductions for a given day window are immutable, so persist them on disk
+            # (SQLite/filesystem access, so it runs in a worker thread too)
+            cache_key = (round(lat, 2), round(lng, 2), buffer_km, date_start_str, date_end_str, self.PRODUCT)
+            cached = await asyncio.to_thread(self._disk_cache_get, cache_key)
             
-            # Calculate mean values
-            no2_mean = no2_collection.mean().reduceRegion(
-                reducer=self.ee.Reducer.mean(),
-                geometry=region,
-                scale=3500  # 3.5km resolution
-            ).getInfo()
-            
-            so2_mean = so2_collection.mean().reduceRegion(
-                reducer=self.ee.Reducer.mean(),
-                geometry=region,
-                scale=7000  # 7km resolution
-            ).getInfo()
+            if cached is not None:
+                no2_mean, so2_mean = cached
+            else:
+                # getInfo() blocks on an Earth Engine RPC; run both reductions
+                # in worker threads concurrently to keep the event loop free
+                window = (lat, lng, buffer_km, date_start_str, date_end_str)
+                no2_mean, so2_mean = await asyncio.gather(
+                    asyncio.to_thread(
+                        self._reduce_region_mean, *window,
+                        'COPERNICUS/S5P/OFFL/L3_NO2', 'NO2_column_number_density', 3500  # 3.5km resolution
+                    ),
+                    asyncio.to_thread(
+                        self._reduce_region_mean, *window,
+                        'COPERNICUS/S5P/OFFL/L3_SO2', 'SO2_column_number_density', 7000  # 7km resolution
+                    )
+                )
+                await asyncio.to_thread(self._disk_cache_set, cache_key, (no2_mean, so2_mean))
             
             return {
                 "source": "Sentinel-5P TROPOMI",
@@ -203,16 +325,66 @@ class Sentinel5PService:
                     "unit": "mol/m²",
                     "spatial_resolution_km": 7.0
                 },
-                "product": "OFFL L3"
+                "product": self.PRODUCT
             }
             
         except Exception as e:
-            print(f"Sentinel-5P processing error: {e}")
+            logger.exception("Sentinel-5P processing error")
             return {
                 "source": "Sentinel-5P",
                 "error": str(e),
                 "data": {}
             }
+    
+    def _get_disk_cache(self):
+        """Open the on-disk reduction cache (None if diskcache is unavailable; blocking)"""
+        with self._disk_cache_lock:
+            if self._disk_cache is None and diskcache is not None:
+                try:
+                    self._disk_cache = diskcache.Cache(settings.SENTINEL5P_CACHE_DIR)
+                except Exception as e:
+                    logger.warning("Sentinel-5P disk cache unavailable: %s", e)
+                    self._disk_cache = False  # Don't retry on every request
+        return self._disk_cache or None
+    
+    def _disk_cache_get(self, key: Tuple) -> Optional[Tuple]:
+        """Cached (no2, so2) reductions for a window, None on a miss (blocking)"""
+        disk_cache = self._get_disk_cache()
+        return disk_cache.get(key) if disk_cache is not None else None
+    
+    def _disk_cache_set(self, key: Tuple, value: Tuple):
+        """Persist (no2, so2) reductions for a window for a day (blocking)"""
+        disk_cache = self._get_disk_cache()
+        if disk_cache is not None:
+            disk_cache.set(key, value, expire=86400)
+    
+    def _reduce_region_mean(
+        self,
+        lat: float,
+        lng: float,
+        buffer_km: float,
+        date_start: str,
+        date_end: str,
+        collection_id: str,
+        band: str,
+        scale: int
+    ) -> Dict:
+        """Compute the mean of one Sentinel-5P band around a point (blocking)"""
+        point = self.ee.Geometry.Point([lng, lat])
+        region = point.buffer(buffer_km * 1000)  # Convert km to meters
+        
+        collection = (
+            self.ee.ImageCollection(collection_id)
+            .filterDate(date_start, date_end)
+            .filterBounds(region)
+            .select(band)
+        )
+        
+        return collection.mean().reduceRegion(
+            reducer=self.ee.Reducer.mean(),
+            geometry=region,
+            scale=scale
+        ).getInfo()
 
 class CPCBService:
     """
@@ -273,11 +445,22 @@ class DataIngestionService:
     """Main data ingestion service that coordinates all sources"""
     
     def __init__(self):
-        self.openaq = OpenAQService()
+        # One pooled keep-alive client shared by all HTTP-based sources; over
+        # HTTP/2 the concurrent OpenAQ calls multiplex onto a few long-lived sockets
+        self._client = httpx.AsyncClient(
+            timeout=httpx.Timeout(15.0, connect=5.0),
+            http2=True,
+            limits=httpx.Limits(max_keepalive_connections=10, max_connections=50, keepalive_expiry=60.0)
+        )
+        self.openaq = OpenAQService(self._client)
         self.sentinel5p = Sentinel5PService()
         self.cpcb = CPCBService()
         self.weather = WeatherService()
     
+    async def close(self):
+        """Close the shared HTTP client"""
+        await self._client.aclose()
+    
     async def fetch_all_sources(
         self,
         lat: float,
@@ -303,13 +486,13 @@ class DataIngestionService:
         if include_weather:
             tasks.append(("weather", self.weather.get_wind_data(lat, lng)))
         
-        # Fetch data concurrently
-        results = {}
-        for source_name, coro in tasks:
-            try:
-                results[source_name] = await coro
-            except Exception as e:
-                results[source_name] = {"error": str(e), "source": source_name}
+        # Fetch data concurrently; a failing source doesn't take down the others
+        names = [source_name for source_name, _ in tasks]
+        outcomes = await asyncio.gather(*(coro for _, coro in tasks), return_exceptions=True)
+        results = {
+            source_name: {"error": str(r), "source": source_name} if isinstance(r, Exception) else r
+            for source_name, r in zip(names, outcomes)
+        }
         
         return {
             "timestamp": datetime.utcnow().isoformat() + "Z",
@@ -317,3 +500,51 @@ class DataIngestionService:
             "sources": results
         }
 
+    
+    async def fetch_cluster(self, points: List[Tuple[float, float]]) -> List[Dict]:
+        """
+        Fetch data for several nearby points with a single ground sensor query
+        
+        OpenAQ is queried once around the cluster centroid, with the radius
+        widened to cover every point and enough stations for each of them;
+        each point then keeps its own closest stations within its search
+        radius, as an unbatched query would. Satellite and weather data are
+        still fetched per point.
+        
+        Returns:
+            List of fetch_all_sources-shaped dicts, one per point
+        """
+        radius_km = settings.GROUND_SENSOR_SEARCH_RADIUS_KM
+        per_point = OpenAQService.MAX_LOCATIONS
+        center_lat = sum(lat for lat, _ in points) / len(points)
+        center_lng = sum(lng for _, lng in points) / len(points)
+        spread_km = max(_haversine_km(center_lat, center_lng, lat, lng) for lat, lng in points)
+        
+        # Widened ground query and per-point satellite/weather fetches overlap
+        ground, results = await asyncio.gather(
+            self.openaq.get_latest_measurements(
+                center_lat, center_lng,
+                radius_km=radius_km + spread_km,
+                max_locations=per_point * len(points)
+            ),
+            asyncio.gather(*(
+                self.fetch_all_sources(lat, lng, include_ground=False) for lat, lng in points
+            ))
+        )
+        
+        for (lat, lng), result in zip(points, results):
+            # Stations without coordinates can't be ranked for a point, so skip them
+            ranked = []
+            for meas in ground.get("measurements", []):
+                coords = meas.get("coordinates") or {}
+                meas_lat, meas_lng = coords.get("latitude"), coords.get("longitude")
+                if meas_lat is None or meas_lng is None:
+                    continue
+                distance_km = _haversine_km(lat, lng, meas_lat, meas_lng)
+                if distance_km <= radius_km:
+                    ranked.append((distance_km, meas))
+            ranked.sort(key=lambda item: item[0])
+            nearby = [meas for _, meas in ranked[:per_point]]
+            result["sources"]["openaq"] = {**ground, "measurements": nearby}
+        
+        return results
@@ -4,15 +4,77 @@ ML Pipeline: Anomaly Detection, Risk Scoring, Forecasting
 
 import numpy as np
 import pandas as pd
-from typing import Dict, List, Optional, Tuple
-from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+from datetime import datetime
+from dataclasses import dataclass
+from pathlib import Path
+import asyncio
+import threading
+import hashlib
+import logging
+import joblib
 from sklearn.ensemble import IsolationForest
 from sklearn.preprocessing import StandardScaler
+from core.config import settings
+from services import _plume_kernels
 import warnings
 warnings.filterwarnings('ignore')
+try:
+    import onnxruntime
+    from skl2onnx import convert_sklearn
+    from skl2onnx.common.data_types import FloatTensorType
+except ImportError:
+    onnxruntime = None
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class MetricsBatch:
+    """
+    Structure-of-arrays view of N metric points for vectorized scoring
+    One contiguous float32 array per pollutant, NaN where a value is missing
+    """
+    
+    pm25: np.ndarray
+    no2: np.ndarray
+    so2: np.ndarray
+    water_quality: np.ndarray
+    n_air: np.ndarray  # Number of air metrics reported per point
+    
+    def __len__(self) -> int:
+        return len(self.pm25)
+    
+    @classmethod
+    def from_metrics(cls, points: List[Dict]) -> "MetricsBatch":
+        """Build a batch from fused metric dicts ({"air": {...}, "water": {...}})"""
+        n = len(points)
+        pm25 = np.full(n, np.nan, dtype=np.float32)
+        no2 = np.full(n, np.nan, dtype=np.float32)
+        so2 = np.full(n, np.nan, dtype=np.float32)
+        water_quality = np.full(n, np.nan, dtype=np.float32)
+        n_air = np.zeros(n, dtype=np.int32)
+        
+        for i, point in enumerate(points):
+            air = point.get("air", {})
+            n_air[i] = len(air)
+            for column, pollutant in ((pm25, "pm25"), (no2, "no2"), (so2, "so2")):
+                value = (air.get(pollutant) or {}).get("value")
+                if value is not None:
+                    column[i] = value
+            
+            score = point.get("water", {}).get("quality_score")
+            if score is not None:
+                water_quality[i] = score
+        
+        return cls(pm25=pm25, no2=no2, so2=so2, water_quality=water_quality, n_air=n_air)
 
 class AnomalyDetector:
-    """Detect anomalies in pollution data using Isolation Forest"""
+    """
+    Detect anomalies in pollution data using Isolation Forest
+    predict() only reads fitted state, so it may run in worker threads
+    """
+    
+    POLLUTION_FEATURES = ['pm25', 'pm10', 'no2', 'so2', 'o3']
     
     def __init__(self, contamination: float = 0.1):
         self.model = IsolationForest(
@@ -22,40 +84,151 @@ class AnomalyDetector:
         )
         self.scaler = StandardScaler()
         self.fitted = False
+        # Feature layout learned in fit(), reused to build single-point vectors
+        self.feature_columns: List[str] = []
+        self.use_time_features = False
+        # ONNX Runtime session for the fitted forest (None -> sklearn inference)
+        self.session = None
+        # Inference state derived from the fitted scaler, see _prepare_inference()
+        self._n_features = 0
+        self._mean_f32 = None
+        self._scale_f32 = None
+        self._local = threading.local()  # Per-thread scratch buffers
     
     def fit(self, historical_data: pd.DataFrame):
-        """Fit the anomaly detection model on historical data"""
+        """
+        Fit the anomaly detection model on historical data
+        
+        Fitted models are cached on disk keyed by a hash of the data, so
+        refitting on an unchanged historical window is a load instead of a fit
+        """
         if len(historical_data) < 10:
             self.fitted = False
             return
         
+        # Hash before feature extraction adds derived columns
+        cache_path = self._model_cache_path(historical_data)
+        if cache_path is not None and cache_path.exists():
+            try:
+                self.model, self.scaler, self.feature_columns, self.use_time_features = joblib.load(cache_path)
+                self._prepare_inference()
+                self.fitted = True
+                return
+            except Exception as e:
+                logger.warning("Could not load cached anomaly model, refitting: %s", e)
+        
+        self.feature_columns = [col for col in self.POLLUTION_FEATURES if col in historical_data.columns]
+        self.use_time_features = 'timestamp' in historical_data.columns
+        
+        # Parse timestamps once into normalized hour/day-of-week columns, on a
+        # copy so the caller's frame isn't mutated
+        if self.use_time_features:
+            timestamps = pd.to_datetime(historical_data['timestamp'])
+            historical_data = historical_data.assign(
+                _hour=timestamps.dt.hour.to_numpy(dtype=np.float32) / 24.0,
+                _dow=timestamps.dt.dayofweek.to_numpy(dtype=np.float32) / 7.0
+            )
+        
         # Prepare features: pollution values and temporal features
         features = self._extract_features(historical_data)
         features_scaled = self.scaler.fit_transform(features)
         self.model.fit(features_scaled)
+        self._prepare_inference()
         self.fitted = True
+        
+        if cache_path is not None:
+            try:
+                cache_path.parent.mkdir(parents=True, exist_ok=True)
+                joblib.dump((self.model, self.scaler, self.feature_columns, self.use_time_features), cache_path)
+            except Exception as e:
+                logger.warning("Could not cache anomaly model: %s", e)
+    
+    def _model_cache_path(self, historical_data: pd.DataFrame) -> Optional[Path]:
+        """Cache file for a model fitted on this data with these hyperparameters"""
+        try:
+            digest = hashlib.sha1(pd.util.hash_pandas_object(historical_data, index=True).values)
+        except TypeError:
+            return None  # Unhashable column contents
+        # Row hashes ignore the schema; same numbers under other columns are another model
+        digest.update(repr(tuple(historical_data.columns)).encode())
+        digest.update(repr(tuple(map(str, historical_data.dtypes))).encode())
+        digest.update(repr(sorted(self.model.get_params().items())).encode())
+        return Path(settings.ANOMALY_MODEL_CACHE_DIR) / f"{digest.hexdigest()}.pkl"
+    
+    def _prepare_inference(self):
+        """Cache fitted scaler parameters and the ONNX session for predict()"""
+        self._n_features = len(self.feature_columns) + (2 if self.use_time_features else 0)
+        self._mean_f32 = self.scaler.mean_.astype(np.float32)
+        self._scale_f32 = self.scaler.scale_.astype(np.float32)
+        self.session = self._export_onnx(self._n_features)
+    
+    def _export_onnx(self, n_features: int):
+        """Export the fitted forest to an ONNX Runtime session (None if unavailable)"""
+        if onnxruntime is None:
+            return None
+        try:
+            onnx_model = convert_sklearn(
+                self.model,
+                initial_types=[('X', FloatTensorType([None, n_features]))],
+                target_opset={'': 15, 'ai.onnx.ml': 3}
+            )
+            return onnxruntime.InferenceSession(
+                onnx_model.SerializeToString(),
+                providers=['CPUExecutionProvider']
+            )
+        except Exception as e:
+            logger.warning("ONNX export failed, using scikit-learn inference: %s", e)
+            return None
     
     def _extract_features(self, df: pd.DataFrame) -> np.ndarray:
         """Extract features for anomaly detection"""
-        features_list = []
-        
-        # Pollution metrics
-        for col in ['pm25', 'pm10', 'no2', 'so2', 'o3']:
-            if col in df.columns:
-                features_list.append(df[col].values)
-        
-        # Temporal features
-        if 'timestamp' in df.columns:
-            df['timestamp'] = pd.to_datetime(df['timestamp'])
-            df['hour'] = df['timestamp'].dt.hour
-            df['day_of_week'] = df['timestamp'].dt.dayofweek
-            features_list.append(df['hour'].values / 24.0)
-            features_list.append(df['day_of_week'].values / 7.0)
-        
-        if not features_list:
-            return np.array([]).reshape(len(df), 0)
-        
-        return np.column_stack(features_list)
+        # Pollution metrics in one shot
+        features = df[self.feature_columns].to_numpy(dtype=np.float32, copy=False)
+        
+        # Temporal features, precomputed by fit()
+        if self.use_time_features:
+            features = np.column_stack([
+                features,
+                df['_hour'].to_numpy(dtype=np.float32),
+                df['_dow'].to_numpy(dtype=np.float32)
+            ])
+        
+        return features
+    
+    def _scale(self, x: np.ndarray) -> np.ndarray:
+        """StandardScaler.transform in place, without sklearn's input validation"""
+        np.subtract(x, self._mean_f32, out=x)
+        np.divide(x, self._scale_f32, out=x)
+        return x
+    
+    def _feature_buffer(self) -> np.ndarray:
+        """(1, n_features) float32 scratch buffer, reused per thread across predictions"""
+        buf = getattr(self._local, "buf", None)
+        if buf is None or buf.shape[1] != self._n_features:
+            buf = self._local.buf = np.empty((1, self._n_features), dtype=np.float32)
+        return buf
+    
+    def _extract_features_single(self, d: Dict, out: np.ndarray) -> np.ndarray:
+        """Fill out[0] with the feature vector for one data point, without pandas"""
+        row = out[0]
+        for k, col in enumerate(self.feature_columns):
+            value = d.get(col)
+            if isinstance(value, dict):  # Fused metric, e.g. {"value": ..., "unit": ...}
+                value = value.get("value")
+            row[k] = value if value is not None else 0.0
+        
+        if self.use_time_features:
+            timestamp = d.get("timestamp")
+            if isinstance(timestamp, str):
+                ts = datetime.fromisoformat(timestamp.replace("Z", "+00:00"))
+            elif isinstance(timestamp, datetime):
+                ts = timestamp
+            else:
+                ts = datetime.utcnow()  # Real-time point without explicit timestamp
+            row[-2] = ts.hour / 24.0
+            row[-1] = ts.weekday() / 7.0
+        
+        return out
     
     def predict(self, current_data: Dict) -> Dict:
         """
@@ -64,6 +237,16 @@ class AnomalyDetector:
         Returns:
             Dict with anomaly_score, is_anomaly, and feature contributions
         """
+        unavailable = self.unavailable_result()
+        if unavailable is not None:
+            return unavailable
+        
+        # Extract and standardize in place in a reused buffer: no per-call allocations
+        features = self._extract_features_single(current_data, self._feature_buffer())
+        return self.result_from_score(self.score_features(features)[0])
+    
+    def unavailable_result(self) -> Optional[Dict]:
+        """Placeholder prediction when the model can't score, None when it can"""
         if not self.fitted:
             return {
                 "anomaly_score": 0.0,
@@ -72,11 +255,7 @@ class AnomalyDetector:
                 "note": "Model not fitted - insufficient historical data"
             }
         
-        # Prepare current data as DataFrame
-        df = pd.DataFrame([current_data])
-        features = self._extract_features(df)
-        
-        if features.shape[1] == 0:
+        if self._n_features == 0:
             return {
                 "anomaly_score": 0.0,
                 "is_anomaly": False,
@@ -84,14 +263,33 @@ class AnomalyDetector:
                 "note": "No features available"
             }
         
-        features_scaled = self.scaler.transform(features)
-        anomaly_score = self.model.score_samples(features_scaled)[0]
-        is_anomaly = self.model.predict(features_scaled)[0] == -1
+        return None
+    
+    def featurize(self, current_data: Dict) -> np.ndarray:
+        """Unscaled (1, n_features) feature row in a fresh array, e.g. to stack into a batch"""
+        return self._extract_features_single(current_data, np.empty((1, self._n_features), dtype=np.float32))
+    
+    def score_features(self, features: np.ndarray) -> np.ndarray:
+        """
+        Anomaly scores (as IsolationForest.score_samples) for an (N, n_features) batch
+        Scales features in place
+        """
+        features = self._scale(features)
+        if self.session is not None:
+            # ONNX "scores" is decision_function, i.e. score_samples - offset_
+            scores, = self.session.run(['scores'], {'X': features})
+            return scores.ravel() + self.model.offset_
+        return self.model.score_samples(features)
+    
+    def result_from_score(self, anomaly_score: float) -> Dict:
+        """Prediction dict for one anomaly score"""
+        # Same rule as IsolationForest.predict, without a second pass over the trees
+        is_anomaly = anomaly_score < self.model.offset_
         
         return {
             "anomaly_score": float(anomaly_score),
             "is_anomaly": bool(is_anomaly),
-            "confidence": abs(anomaly_score),
+            "confidence": abs(float(anomaly_score)),
             "threshold": -0.5  # Typical threshold for Isolation Forest
         }
 
@@ -99,6 +297,7 @@ class RiskScorer:
     """
     Multi-factor risk scoring model
     Combines exposure, duration, sensitivity, and uncertainty
+    Stateless, so calculate_risk_score may run in worker threads
     """
     
     # WHO Air Quality Guidelines (2021)
@@ -122,6 +321,19 @@ class RiskScorer:
         "o3_8h": 180.0,      # μg/m³
     }
     
+    # WHO 24h thresholds of the exposure pollutants, in MetricsBatch order (pm25, no2, so2)
+    _THR = np.array(
+        [WHO_THRESHOLDS["pm25_24h"], WHO_THRESHOLDS["no2_24h"], WHO_THRESHOLDS["so2_24h"]],
+        dtype=np.float32
+    )
+    
+    # Pollutants with 24h WHO guidelines, used for duration scoring
+    _DURATION_POLLS = ('pm25', 'pm10', 'no2', 'so2')
+    _DURATION_THR = np.array(
+        [WHO_THRESHOLDS["pm25_24h"], WHO_THRESHOLDS["pm10_24h"], WHO_THRESHOLDS["no2_24h"], WHO_THRESHOLDS["so2_24h"]],
+        dtype=np.float32
+    )
+    
     def calculate_risk_score(
         self,
         metrics: Dict,
@@ -139,11 +351,44 @@ class RiskScorer:
         Returns:
             Dict with risk_score, exposure_score, duration_score, confidence, verdict
         """
+        # Single point: score a one-row batch
+        scores = self.calculate_risk_scores(
+            MetricsBatch.from_metrics([metrics]), historical_trend, data_quality
+        )
+        
+        return {
+            "risk_score": float(scores["risk_score"][0]),
+            "exposure_score": float(scores["exposure_score"][0]),
+            "duration_score": scores["duration_score"],
+            "uncertainty_penalty": scores["uncertainty_penalty"],
+            "verdict": str(scores["verdict"][0]),
+            "confidence": float(scores["confidence"][0]),
+            "model_version": scores["model_version"]
+        }
+    
+    def calculate_risk_scores(
+        self,
+        batch: MetricsBatch,
+        historical_trend: Optional[List[Dict]] = None,
+        data_quality: Dict = None
+    ) -> Dict:
+        """
+        Calculate risk scores for N points sharing one history and data quality
+        
+        Args:
+            batch: Current pollution metrics for N points
+            historical_trend: Historical data for duration scoring
+            data_quality: Data quality indicators (coverage, age, etc.)
+        
+        Returns:
+            Dict with length-N risk_score, exposure_score, verdict and confidence
+            arrays, plus the shared duration_score and uncertainty_penalty
+        """
         if data_quality is None:
             data_quality = {"coverage": 1.0, "age_hours": 0}
         
         # 1. Exposure Score (0-100)
-        exposure_score = self._calculate_exposure_score(metrics)
+        exposure_score = self.exposure_scores(batch)
         
         # 2. Duration Score (0-100)
         duration_score = self._calculate_duration_score(historical_trend)
@@ -160,99 +405,67 @@ class RiskScorer:
         )
         
         # Ensure score is between 0-100
-        risk_score = max(0, min(100, risk_score))
+        risk_score = np.clip(risk_score, 0, 100)
         
         # 5. Determine verdict
-        if risk_score >= 67:
-            verdict = "UNSAFE"
-        elif risk_score >= 34:
-            verdict = "MODERATE"
-        else:
-            verdict = "SAFE"
+        verdict = np.where(risk_score >= 67, "UNSAFE", np.where(risk_score >= 34, "MODERATE", "SAFE"))
         
         # 6. Calculate confidence (based on data quality)
-        confidence = self._calculate_confidence(data_quality, metrics)
+        confidence = self._calculate_confidence(data_quality, batch)
         
         return {
-            "risk_score": round(risk_score, 1),
-            "exposure_score": round(exposure_score, 1),
+            "risk_score": np.round(risk_score, 1),
+            "exposure_score": np.round(exposure_score, 1),
             "duration_score": round(duration_score, 1),
             "uncertainty_penalty": round(uncertainty_penalty, 1),
             "verdict": verdict,
-            "confidence": round(confidence, 1),
+            "confidence": np.round(confidence, 1),
             "model_version": "1.0.0"
         }
     
-    def _calculate_exposure_score(self, metrics: Dict) -> float:
-        """Calculate exposure score based on threshold exceedances"""
-        max_exceedance = 0.0
-        
-        # Air quality metrics
-        air = metrics.get("air", {})
-        
-        # PM2.5
-        if "pm25" in air and air["pm25"].get("value") is not None:
-            value = air["pm25"]["value"]
-            threshold = self.WHO_THRESHOLDS["pm25_24h"]
-            exceedance = value / threshold if threshold > 0 else 0
-            max_exceedance = max(max_exceedance, exceedance)
-        
-        # NO2
-        if "no2" in air and air["no2"].get("value") is not None:
-            value = air["no2"]["value"]
-            threshold = self.WHO_THRESHOLDS["no2_24h"]
-            exceedance = value / threshold if threshold > 0 else 0
-            max_exceedance = max(max_exceedance, exceedance)
-        
-        # SO2
-        if "so2" in air and air["so2"].get("value") is not None:
-            value = air["so2"]["value"]
-            threshold = self.WHO_THRESHOLDS["so2_24h"]
-            exceedance = value / threshold if threshold > 0 else 0
-            max_exceedance = max(max_exceedance, exceedance)
-        
-        # Water quality
-        water = metrics.get("water", {})
-        if "quality_score" in water:
-            score = water["quality_score"]
-            # Lower score = higher risk
-            water_risk = (100 - score) / 100.0
-            max_exceedance = max(max_exceedance, water_risk)
+    def exposure_scores(self, batch: MetricsBatch) -> np.ndarray:
+        """Exposure score (0-100) per point, from threshold exceedances"""
+        # Largest exceedance across pollutants and water risk (lower score =
+        # higher risk); fmax skips NaN, so missing metrics don't count
+        exceedance = np.fmax.reduce([
+            batch.pm25 / self._THR[0],
+            batch.no2 / self._THR[1],
+            batch.so2 / self._THR[2],
+            (100 - batch.water_quality) / 100.0
+        ])
+        exceedance = np.fmax(exceedance, 0.0)  # All-missing points score 0
         
         # Convert exceedance factor to score (0-100)
         # exceedance of 1.0 = threshold = score of 50
         # exceedance of 2.0 = 2x threshold = score of 100
-        exposure_score = min(100, max_exceedance * 50)
-        
-        return exposure_score
+        return np.minimum(100, exceedance.astype(np.float64) * 50)
     
     def _calculate_duration_score(self, historical_trend: Optional[List[Dict]]) -> float:
         """Calculate duration score based on persistence of high exposure"""
         if not historical_trend or len(historical_trend) < 7:
             return 50.0  # Default moderate if no history
         
-        # Count days with high exposure in last 30 days
-        high_exposure_days = 0
+        # Count days with high exposure in last 30 days: a day counts if any
+        # pollutant with a 24h guideline exceeds it
         total_days = min(30, len(historical_trend))
-        
-        for day_data in historical_trend[-total_days:]:
-            # Check if any metric exceeds thresholds
-            air = day_data.get("air", {})
-            for pollutant, data in air.items():
-                if isinstance(data, dict) and "value" in data:
-                    value = data["value"]
-                    threshold_key = f"{pollutant}_24h"
-                    if threshold_key in self.WHO_THRESHOLDS:
-                        threshold = self.WHO_THRESHOLDS[threshold_key]
-                        if value > threshold:
-                            high_exposure_days += 1
-                            break
+        values = self._trend_to_array(historical_trend[-total_days:])
+        high_exposure_days = int((values > self._DURATION_THR[None, :]).any(axis=1).sum())
         
         # Score: percentage of days with high exposure
         duration_score = (high_exposure_days / total_days) * 100
         
         return duration_score
     
+    def _trend_to_array(self, trend: List[Dict]) -> np.ndarray:
+        """Stack daily pollutant values into an (N, P) float32 array, NaN where missing"""
+        return np.array(
+            [
+                [(day.get("air", {}).get(pollutant) or {}).get("value", np.nan) for pollutant in self._DURATION_POLLS]
+                for day in trend
+            ],
+            dtype=np.float32
+        )
+    
     def _calculate_uncertainty_penalty(self, data_quality: Dict) -> float:
         """Calculate uncertainty penalty (higher = more uncertainty = higher risk)"""
         penalty = 0.0
@@ -269,8 +482,8 @@ class RiskScorer:
         
         return min(100, penalty)
     
-    def _calculate_confidence(self, data_quality: Dict, metrics: Dict) -> float:
-        """Calculate confidence score (0-100)"""
+    def _calculate_confidence(self, data_quality: Dict, batch: MetricsBatch) -> np.ndarray:
+        """Calculate confidence score (0-100) per point"""
         confidence = 100.0
         
         # Reduce confidence for old data
@@ -283,11 +496,9 @@ class RiskScorer:
         confidence *= coverage
         
         # Reduce confidence if missing critical metrics
-        air = metrics.get("air", {})
-        if not air or len(air) < 2:
-            confidence *= 0.7
+        confidence = np.where(batch.n_air < 2, confidence * 0.7, confidence)
         
-        return max(0, min(100, confidence))
+        return np.clip(confidence, 0, 100)
 
 class PlumeTracer:
     """
@@ -295,6 +506,9 @@ class PlumeTracer:
     Uses wind vectors to trace pollution plumes backward in time
     """
     
+    TURBULENCE_SIGMA_M = 500.0  # Random-walk spread per hourly step
+    HISTOGRAM_BINS = 20
+    
     async def trace_plume(
         self,
         detection_lat: float,
@@ -302,7 +516,8 @@ class PlumeTracer:
         pollutant: str,
         intensity: float,
         wind_data: Dict,
-        hours_back: int = 48
+        hours_back: int = 48,
+        n_particles: int = 1000
     ) -> Dict:
         """
         Trace plume backward to identify likely source
@@ -312,31 +527,65 @@ class PlumeTracer:
             detection_lng: Detection point longitude
             pollutant: Pollutant type (SO2, NO2, etc.)
             intensity: Detection intensity
-            wind_data: Wind vector data (u, v components)
+            wind_data: Wind vector data; a gridded field is expected under
+                "grid" as a (hours, H, W, 2) u/v array in m/s, with
+                "grid_origin" (lat, lng) of cell [0, 0] and "grid_resolution_deg"
             hours_back: How many hours to trace back
+            n_particles: Number of Lagrangian particles released
         
         Returns:
             Dict with source estimate and confidence region
         """
-        # Simplified implementation
-        # Full implementation would:
-        # 1. Get hourly wind vectors for the time period
-        # 2. Trace backward using Lagrangian particle model
-        # 3. Account for turbulence and dispersion
-        # 4. Identify source regions with high probability
+        wind_grid = wind_data.get("grid") if wind_data else None
+        
+        if wind_grid is None:
+            # Placeholder: Return detection point as source estimate
+            # (Needs gridded ERA5 wind vectors to run the trajectory model)
+            return {
+                "source_estimate": {
+                    "lat": detection_lat,
+                    "lng": detection_lng,
+                    "confidence_radius_km": 10.0,
+                    "probability": 0.5
+                },
+                "trajectory_model": "Lagrangian backward (simplified)",
+                "note": "Full plume tracing requires ERA5 wind data integration",
+                "hours_traced": hours_back
+            }
+        
+        grid_lat0, grid_lng0 = wind_data["grid_origin"]
+        wind = np.ascontiguousarray(wind_grid, dtype=np.float32)
+        
+        # Particle loop runs in the JIT kernel, off the event loop
+        positions = await asyncio.to_thread(
+            _plume_kernels.backtrace,
+            float(detection_lat), float(detection_lng), wind,
+            float(grid_lat0), float(grid_lng0), float(wind_data["grid_resolution_deg"]),
+            n_particles, hours_back, 3600.0, self.TURBULENCE_SIGMA_M
+        )
         
-        # Placeholder: Return detection point as source estimate
-        # (In production, this would run actual trajectory model)
+        # Source-probability grid from the final particle positions
+        density, lat_edges, lng_edges = np.histogram2d(
+            positions[:, 0], positions[:, 1], bins=self.HISTOGRAM_BINS
+        )
+        i, j = np.unravel_index(np.argmax(density), density.shape)
+        source_lat = (lat_edges[i] + lat_edges[i + 1]) / 2
+        source_lng = (lng_edges[j] + lng_edges[j + 1]) / 2
+        
+        # Spread of particles around the estimate (km)
+        spread_km = np.hypot(
+            (positions[:, 0] - source_lat) * 111.32,
+            (positions[:, 1] - source_lng) * 111.32 * np.cos(np.radians(source_lat))
+        )
         
         return {
             "source_estimate": {
-                "lat": detection_lat,
-                "lng": detection_lng,
-                "confidence_radius_km": 10.0,
-                "probability": 0.5
+                "lat": float(source_lat),
+                "lng": float(source_lng),
+                "confidence_radius_km": float(np.percentile(spread_km, 68)),
+                "probability": float(density[i, j] / n_particles)
             },
-            "trajectory_model": "Lagrangian backward (simplified)",
-            "note": "Full plume tracing requires ERA5 wind data integration",
-            "hours_traced": hours_back
+            "trajectory_model": "Lagrangian backward (particle, nearest-neighbour wind)",
+            "particles": n_particles,
+            "hours_traced": min(hours_back, wind.shape[0])
         }
-
@@ -0,0 +1,39 @@
+"""
+Data Quality Assessment
+Coverage and freshness indicators for ingested source data
+"""
+
+from datetime import datetime
+
+def assess_data_quality(raw_data: dict) -> dict:
+    """
+    Assess data quality metrics
+    
+    Args:
+        raw_data: Output of DataIngestionService.fetch_all_sources
+    
+    Returns:
+        Dict with coverage, age_hours, valid_sources, total_sources
+    """
+    sources = raw_data.get("sources", {})
+    
+    # Calculate coverage (how many sources provided data)
+    total_sources = len(sources)
+    valid_sources = sum(1 for s in sources.values() if "error" not in s)
+    coverage = valid_sources / total_sources if total_sources > 0 else 0.0
+    
+    # Calculate data age (hours)
+    now = datetime.utcnow()
+    timestamp_str = raw_data.get("timestamp", now.isoformat() + "Z")
+    try:
+        data_time = datetime.fromisoformat(timestamp_str.replace("Z", "+00:00"))
+        age_hours = (now - data_time.replace(tzinfo=None)).total_seconds() / 3600
+    except:
+        age_hours = 0
+    
+    return {
+        "coverage": coverage,
+        "age_hours": age_hours,
+        "valid_sources": valid_sources,
+        "total_sources": total_sources
+    }
@@ -0,0 +1,61 @@
+"""
+Request Coalescer
+Collapses concurrent identical upstream fetches into a single shared call
+"""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+# In-flight fetches keyed by request identity (e.g. rounded (lat, lng) cell)
+_inflight: Dict[Hashable, asyncio.Task] = {}
+
+async def coalesce(key: Hashable, fetch: Callable[[], Awaitable[Any]]) -> Any:
+    """
+    Run fetch() unless a call for the same key is already in flight
+
+    The fetch runs in its own task, so a caller being cancelled (e.g. a
+    client disconnect) doesn't cancel the work shared with other callers.
+
+    Args:
+        key: Identity of the request; concurrent callers with equal keys share one call
+        fetch: Zero-argument coroutine function performing the actual work
+
+    Returns:
+        Result of the (possibly shared) fetch
+    """
+    task = _inflight.get(key)
+    if task is None:
+        task = asyncio.ensure_future(fetch())
+        _inflight[key] = task
+        task.add_done_callback(lambda done: _fetch_done(key, done))
+
+    # Shield so a cancelled caller doesn't cancel the shared fetch
+    return await asyncio.shield(task)
+
+def _fetch_done(key: Hashable, task: asyncio.Task):
+    """Forget a finished fetch"""
+    if _inflight.get(key) is task:
+        del _inflight[key]
+    if not task.cancelled():
+        task.exception()  # Mark as retrieved when every caller has gone
+
+async def coalesced_fetch(
+    fetch: Callable[[float, float], Awaitable[Dict]],
+    lat: float,
+    lng: float
+) -> Dict:
+    """
+    Fetch data for a location, sharing the result with concurrent callers
+
+    Callers whose coordinates fall in the same ~100m cell while a fetch is
+    in flight await that fetch instead of starting a new one.
+
+    Args:
+        fetch: Coroutine function taking (lat, lng), e.g. fetch_all_sources
+        lat: Latitude
+        lng: Longitude
+
+    Returns:
+        Result of the (possibly shared) fetch
+    """
+    return await coalesce((round(lat, 3), round(lng, 3)), lambda: fetch(lat, lng))